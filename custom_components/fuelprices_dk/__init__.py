@@ -1,16 +1,42 @@
 from __future__ import annotations
-from homeassistant.helpers.discovery import async_load_platform
+from homeassistant.config_entries import ConfigEntry, SOURCE_IMPORT
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import (
+    DataUpdateCoordinator,
+    UpdateFailed,
+)
+
+import asyncio
 import logging
+from datetime import timedelta
 
-from .fuelprices_dk_api import fuelprices
+from .fuelprices_dk_api import fuelprices, priceChangeFromDict
+from .fuelprices_dk_publisher import createSink, priceEventStream, pricePublisher
 
 from .const import (
     DOMAIN,
     CONF_CLIENT,
+    CONF_COORDINATOR,
     CONF_FUELCOMPANIES,
     CONF_FUELTYPES,
     CONF_UPDATE_INTERVAL,
     CONF_PLATFORM,
+    CONF_PUBLISHER,
+    CONF_REFRESH_LOCK,
+    CONF_SINK,
+    CONF_SINK_TARGET,
+    CONF_STOPPING,
+    CONF_STORE,
+    CONF_STREAM,
+    EVENT_PRICE_CHANGED,
+    PLATFORMS,
+    SINK_NONE,
+    STORAGE_KEY,
+    STORAGE_VERSION,
+    STORE_EMITTED,
+    STORE_PENDING,
     UPDATE_INTERVAL,
 )
 
@@ -25,6 +51,21 @@ async def async_setup(hass, config):
     if conf is None:
         return True
 
+    # Import the YAML configuration into a config entry
+    hass.async_create_task(
+        hass.config_entries.flow.async_init(
+            DOMAIN, context={"source": SOURCE_IMPORT}, data=dict(conf)
+        )
+    )
+
+    # Initialization was successful.
+    return True
+
+
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    # Options (set from the UI) take precedence over the initial data
+    conf = {**entry.data, **entry.options}
+
     # Extract companies and fuueltypes from the config, defult to empty list
     fuelCompanies = conf.get(CONF_FUELCOMPANIES, [])
     fuelTypes = conf.get(CONF_FUELTYPES, [])
@@ -33,17 +74,173 @@ async def async_setup(hass, config):
     _LOGGER.debug("fuelCompanies: " + str(fuelCompanies))
     _LOGGER.debug("fuelTypes: " + str(fuelTypes))
 
-    # Initialize a instance of the fuelprices API
+    # Initialize a instance of the fuelprices API, owned by this entry only
     fuelPrices = fuelprices()
     # Load the data using the config
     fuelPrices.loadCompanies(fuelCompanies, fuelTypes)
-    # Store the client in the hass data stack
-    hass.data[DOMAIN] = {CONF_CLIENT: fuelPrices, CONF_UPDATE_INTERVAL: updateInterval}
 
-    # Add sensors
-    hass.async_create_task(
-        async_load_platform(hass, CONF_PLATFORM, DOMAIN, conf, config)
+    # Stream of price changes for async iterators, and the optional publisher
+    stream = priceEventStream()
+    sink = createSink(
+        hass, conf.get(CONF_SINK, SINK_NONE), conf.get(CONF_SINK_TARGET, "")
+    )
+    publisher = pricePublisher(sink) if sink else None
+
+    # Restore the prices emitted before the restart or reload, so the changes
+    # are resumed from there instead of emitting all the prices again.
+    # Restore the changes the sink did not receive as well, to retry them
+    store = Store(hass, STORAGE_VERSION, STORAGE_KEY + "." + entry.entry_id)
+    storedData = await store.async_load() or {}
+    fuelPrices.setEmittedPrices(storedData.get(STORE_EMITTED, {}))
+    if publisher:
+        publisher.restorePending(
+            [priceChangeFromDict(data) for data in storedData.get(STORE_PENDING, [])]
+        )
+
+    # The first refresh runs during setup, so do not sleep between the companies
+    firstRefresh = True
+    # Set on unload, and held while refreshing, so unload can wait for a refresh
+    stopping = asyncio.Event()
+    refreshLock = asyncio.Lock()
+
+    # Define a update function
+    async def async_update_data():
+        async with refreshLock:
+            return await _async_refresh_companies()
+
+    async def _async_refresh_companies():
+        nonlocal firstRefresh
+        failed = 0
+        # Loop through the fuelcompanies and call the refresh function
+        # Sleep for 3 seconds
+        for company in fuelPrices.getCompanies():
+            # Stop scraping when the entry is unloading
+            if stopping.is_set():
+                break
+            # A failing company keeps its last prices, and the others are refreshed
+            try:
+                await hass.async_add_executor_job(company.refreshPrices)
+            except Exception as err:
+                failed += 1
+                _LOGGER.error(
+                    "Unable to refresh prices from %s: %s", company.getName(), err
+                )
+            if not firstRefresh:
+                # Sleep, but wake up at once when the entry is unloading
+                try:
+                    await asyncio.wait_for(stopping.wait(), 3)
+                except asyncio.TimeoutError:
+                    pass
+        firstRefresh = False
+
+        # Nothing is emitted or stored by a refresh interrupted by unload
+        if stopping.is_set():
+            return []
+
+        # Emit the changes of this cycle, also from companies refreshed before a
+        # failing one, compared with the last emitted prices
+        changes = fuelPrices.popPriceChanges()
+        _LOGGER.debug("Price changes: %s", changes)
+        for change in changes:
+            hass.bus.async_fire(
+                EVENT_PRICE_CHANGED, {"entry_id": entry.entry_id, **change.asDict()}
+            )
+        stream.push(changes)
+        if publisher:
+            publisher.publish(changes)
+        await store.async_save(_storeData(fuelPrices, publisher))
+
+        if failed and failed == len(fuelPrices.getCompanies()):
+            raise UpdateFailed("Unable to refresh prices from any company")
+        return changes
+
+    # Create a coordinator
+    coordinator = DataUpdateCoordinator(
+        hass,
+        _LOGGER,
+        name=CONF_PLATFORM,
+        update_method=async_update_data,
+        update_interval=timedelta(minutes=updateInterval),
     )
 
+    # Start delivering before the first refresh, so changes since the last run are
+    # published too
+    if publisher:
+        publisher.start(hass, entry)
+
+    # Immediate refresh, a failure only makes the sensors unavailable
+    await coordinator.async_refresh()
+
+    # Store the client and the coordinator under this entry in the hass data stack
+    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = {
+        CONF_CLIENT: fuelPrices,
+        CONF_COORDINATOR: coordinator,
+        CONF_PUBLISHER: publisher,
+        CONF_REFRESH_LOCK: refreshLock,
+        CONF_STOPPING: stopping,
+        CONF_STORE: store,
+        CONF_STREAM: stream,
+        CONF_UPDATE_INTERVAL: updateInterval,
+    }
+
+    # Reload the entry when the options are changed
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+
+    # Add sensors
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+
     # Initialization was successful.
     return True
+
+
+async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    unloaded = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    if unloaded:
+        # Remove the data of the entry
+        entryData = hass.data[DOMAIN].pop(entry.entry_id)
+        # Stop the refreshes, and wait for a running one to finish, before the
+        # sessions are closed. Otherwise it keeps scraping on the closed sessions
+        entryData[CONF_STOPPING].set()
+        await entryData[CONF_COORDINATOR].async_shutdown()
+        async with entryData[CONF_REFRESH_LOCK]:
+            pass
+        # Stop publishing and close the sessions
+        entryData[CONF_STREAM].close()
+        if entryData[CONF_PUBLISHER]:
+            await entryData[CONF_PUBLISHER].async_stop()
+        # Save what the sink did not receive, it is retried on the next setup
+        await entryData[CONF_STORE].async_save(
+            _storeData(entryData[CONF_CLIENT], entryData[CONF_PUBLISHER])
+        )
+        await hass.async_add_executor_job(entryData[CONF_CLIENT].close)
+    return unloaded
+
+
+# The data kept in the store: the emitted prices and the undelivered changes
+def _storeData(fuelPrices, publisher):
+    pending = publisher.getPending() if publisher else []
+    return {
+        STORE_EMITTED: fuelPrices.getEmittedPrices(),
+        STORE_PENDING: [change.asDict() for change in pending],
+    }
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    # Remove the stored emitted prices and undelivered changes of the entry
+    await Store(hass, STORAGE_VERSION, STORAGE_KEY + "." + entry.entry_id).async_remove()
+
+
+@callback
+def async_subscribe(hass: HomeAssistant, entry_id: str):
+    """Return an async iterator with the price changes of a loaded entry.
+
+    The iterator receives the changes from its first iteration, and ends when
+    the entry is unloaded.
+    """
+    if entry_id not in hass.data.get(DOMAIN, {}):
+        raise HomeAssistantError("Fuelprices DK entry is not loaded: " + entry_id)
+    return hass.data[DOMAIN][entry_id][CONF_STREAM].subscribe()
+
+
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    await hass.config_entries.async_reload(entry.entry_id)
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import logging
+
+import voluptuous as vol
+
+from homeassistant import config_entries
+from homeassistant.core import callback
+import homeassistant.helpers.config_validation as cv
+
+from .fuelprices_dk_api import FUEL_COMPANIES
+from .const import (
+    CONF_FUELCOMPANIES,
+    CONF_FUELTYPES,
+    CONF_SINK,
+    CONF_SINK_TARGET,
+    CONF_UPDATE_INTERVAL,
+    DOMAIN,
+    SINK_FILE,
+    SINK_MQTT,
+    SINK_NONE,
+    SINK_WEBHOOK,
+    SINKS,
+    TITLE,
+    UPDATE_INTERVAL,
+)
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+_LOGGER = logging.getLogger(__name__)
+
+
+# Build the schema for the companies, fueltypes and interval
+# Empty lists means ALL companies or ALL fueltypes, like in the YAML config
+def _buildSchema(conf):
+    companies = {key: company["name"] for key, company in FUEL_COMPANIES.items()}
+    fuelTypes = sorted(
+        {
+            productKey
+            for company in FUEL_COMPANIES.values()
+            for productKey in company["products"]
+        }
+    )
+    return vol.Schema(
+        {
+            vol.Optional(
+                CONF_FUELCOMPANIES, default=list(conf.get(CONF_FUELCOMPANIES, []))
+            ): cv.multi_select(companies),
+            vol.Optional(
+                CONF_FUELTYPES, default=list(conf.get(CONF_FUELTYPES, []))
+            ): cv.multi_select({fuelType: fuelType for fuelType in fuelTypes}),
+            vol.Optional(
+                CONF_UPDATE_INTERVAL,
+                default=conf.get(CONF_UPDATE_INTERVAL, UPDATE_INTERVAL),
+            ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+            vol.Optional(CONF_SINK, default=conf.get(CONF_SINK, SINK_NONE)): vol.In(
+                SINKS
+            ),
+            # MQTT topic, webhook URL or path of the file
+            vol.Optional(
+                CONF_SINK_TARGET, default=conf.get(CONF_SINK_TARGET, "")
+            ): str,
+        }
+    )
+
+
+# A sink needs a target to deliver the price changes to
+# The stripped target is written back, so the validated value is the one saved
+def _validate(hass, user_input):
+    errors = {}
+    sink = user_input.get(CONF_SINK, SINK_NONE)
+    target = user_input.get(CONF_SINK_TARGET, "").strip()
+    user_input[CONF_SINK_TARGET] = target
+    if sink != SINK_NONE and not target:
+        errors[CONF_SINK_TARGET] = "target_required"
+    elif sink == SINK_MQTT:
+        # Use the MQTT integration of Home Assistant, only imported when used
+        from homeassistant.components import mqtt
+
+        try:
+            mqtt.valid_publish_topic(target)
+        except vol.Invalid:
+            errors[CONF_SINK_TARGET] = "invalid_topic"
+    elif sink == SINK_WEBHOOK:
+        try:
+            cv.url(target)
+        except vol.Invalid:
+            errors[CONF_SINK_TARGET] = "invalid_url"
+    elif sink == SINK_FILE and not hass.config.is_allowed_path(target):
+        errors[CONF_SINK_TARGET] = "path_not_allowed"
+    return errors
+
+
+class FuelPricesConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
+    VERSION = 1
+
+    async def async_step_user(self, user_input=None):
+        """Handle a flow initiated from the UI."""
+        errors = {}
+        if user_input is not None:
+            errors = _validate(self.hass, user_input)
+            if not errors:
+                return self.async_create_entry(title=TITLE, data=user_input)
+
+        return self.async_show_form(
+            step_id="user", data_schema=_buildSchema(user_input or {}), errors=errors
+        )
+
+    async def async_step_import(self, user_input):
+        """Import the YAML configuration, and keep it in sync on restarts."""
+        await self.async_set_unique_id(DOMAIN)
+        self._abort_if_unique_id_configured(updates=user_input)
+        return self.async_create_entry(title=TITLE, data=user_input)
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        return FuelPricesOptionsFlow(config_entry)
+
+
+class FuelPricesOptionsFlow(config_entries.OptionsFlow):
+    def __init__(self, config_entry) -> None:
+        self._entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        """Change companies, fueltypes and interval without a restart."""
+        errors = {}
+        if user_input is not None:
+            errors = _validate(self.hass, user_input)
+            if not errors:
+                return self.async_create_entry(title="", data=user_input)
+
+        conf = user_input or {**self._entry.data, **self._entry.options}
+        return self.async_show_form(
+            step_id="init", data_schema=_buildSchema(conf), errors=errors
+        )
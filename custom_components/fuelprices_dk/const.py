@@ -1,12 +1,34 @@
 CONF_CLIENT = "client"
+CONF_COORDINATOR = "coordinator"
 CONF_FUELCOMPANIES = "companies"
 CONF_FUELTYPES = "fueltypes"
 CONF_UPDATE_INTERVAL = "update_interval"
 CONF_PLATFORM = "sensor"
+CONF_PUBLISHER = "publisher"
+CONF_REFRESH_LOCK = "refresh_lock"
+CONF_SINK = "sink"
+CONF_SINK_TARGET = "sink_target"
+CONF_STOPPING = "stopping"
+CONF_STORE = "store"
+CONF_STREAM = "stream"
 CREDITS = [
     {"Created by": "J-Lindvig (https://github.com/J-Lindvig)"},
     {"Techinal support": "Peer Jensen (www.fuelfinder.dk)"},
 ]
 DOMAIN = "fuelprices_dk"
+EVENT_PRICE_CHANGED = DOMAIN + "_price_changed"
 PATH = "./custom_components/" + DOMAIN + "/"
+PLATFORMS = [CONF_PLATFORM]
+SINK_FILE = "file"
+SINK_MQTT = "mqtt"
+SINK_NONE = "none"
+SINK_WEBHOOK = "webhook"
+STORAGE_KEY = DOMAIN + ".emitted_prices"
+STORAGE_VERSION = 1
+STORE_EMITTED = "emitted"
+STORE_PENDING = "pending"
+SINKS = [SINK_NONE, SINK_MQTT, SINK_WEBHOOK, SINK_FILE]
+SINK_TIMEOUT = 10
+STREAM_QUEUE_SIZE = 100
+TITLE = "Fuelprices DK"
 UPDATE_INTERVAL = 60
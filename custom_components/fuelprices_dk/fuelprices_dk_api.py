@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import copy
 import logging
 from datetime import datetime
 from .fuelprices_dk_parsers import fuelParser  # Module containing parsers
@@ -110,27 +111,27 @@ class fuelprices:
         # Loop through all the companyKeys
         for companyKey in companyKeys:
             if companyKey in FUEL_COMPANIES.keys():
-                _LOGGER.debug(
-                    "Adding fuelcompany: " + FUEL_COMPANIES[companyKey]["name"]
-                )
+                # Work on a copy, so several clients never share (or strip) products
+                company = copy.deepcopy(FUEL_COMPANIES[companyKey])
+                _LOGGER.debug("Adding fuelcompany: " + company["name"])
 
                 # Loop through all the products and remove the ones NOT specified
-                for productKey in list(FUEL_COMPANIES[companyKey]["products"].keys()):
+                for productKey in list(company["products"].keys()):
                     if not productKey in productKeys:
-                        del FUEL_COMPANIES[companyKey]["products"][productKey]
+                        del company["products"][productKey]
                     else:
                         _LOGGER.debug(
                             "Adding product to "
-                            + FUEL_COMPANIES[companyKey]["name"]
+                            + company["name"]
                             + ": "
-                            + FUEL_COMPANIES[companyKey]["products"][productKey]["name"]
+                            + company["products"][productKey]["name"]
                         )
 
                 self._fuelCompanies[companyKey] = fuelCompany(
                     companyKey,
-                    FUEL_COMPANIES[companyKey]["name"],
-                    FUEL_COMPANIES[companyKey]["url"],
-                    FUEL_COMPANIES[companyKey]["products"],
+                    company["name"],
+                    company["url"],
+                    company["products"],
                     fuelParser(),
                 )
 
@@ -148,9 +149,36 @@ class fuelprices:
         return list(productKeys)
 
     # Refresh prices from all the products from all the companies
+    # Return a list with the changed prices
     def refresh(self):
         for company in self.getCompanies():
             company.refreshPrices()
+        return self.popPriceChanges()
+
+    # Return the changed prices of all the companies and mark them as emitted
+    def popPriceChanges(self):
+        changes = []
+        for company in self.getCompanies():
+            changes.extend(company.getPriceChanges())
+            company.markPricesEmitted()
+        return changes
+
+    # Emitted prices of all the companies, {companyKey: {productKey: price}}
+    def getEmittedPrices(self):
+        return {
+            companyKey: company.getEmittedPrices()
+            for companyKey, company in self._fuelCompanies.items()
+        }
+
+    def setEmittedPrices(self, prices):
+        for companyKey, companyPrices in prices.items():
+            if self._companyExists(companyKey):
+                self._fuelCompanies[companyKey].setEmittedPrices(companyPrices)
+
+    # Close the sessions of all the companies
+    def close(self):
+        for company in self.getCompanies():
+            company.close()
 
     def getCompany(self, companyKey):
         if self._companyExists(companyKey):
@@ -186,6 +214,7 @@ class fuelCompany:
         self._products = products  # Dictionary with products and prices
         self._parser = parser  # Instance of the parser module
         self._priceType = DEFAULT_PRICE_TYPE  # Default type of prices
+        self._emittedPrices = {}  # Prices last emitted as changes
 
     def getName(self):
         return self._name
@@ -199,17 +228,66 @@ class fuelCompany:
         # Run the function, from the parser, with the same name as the companys key
         # Provide the URL and the dictionary with the products
         # Update the dictionary with products with the returned data
-        self._products = getattr(self._parser, self._key)(self._url, self._products)
+        products = getattr(self._parser, self._key)(self._url, self._products)
+        # Some parsers return None when the site fails, keep the last prices
+        if products is None:
+            raise ValueError("No prices returned from: " + self._name)
+        self._products = products
         _LOGGER.debug("products: %s", self._products)
         # If the Key 'priceType' is present, extract it from the dict, else use DEFAULT_PRICE_TYPE
         self._priceType = self._products.pop("priceType", DEFAULT_PRICE_TYPE)
 
+    # Return a list of priceChange, one for each product with a price different
+    # from the last emitted one. Products without an emitted price are not a change
+    def getPriceChanges(self):
+        changes = []
+        for productKey, productDict in self._products.items():
+            newPrice = productDict.get("price")
+            oldPrice = self._emittedPrices.get(productKey)
+            if newPrice is None or oldPrice is None or newPrice == oldPrice:
+                continue
+            changes.append(
+                priceChange(
+                    self._key,
+                    self._name,
+                    productKey,
+                    productDict["name"],
+                    oldPrice,
+                    newPrice,
+                    self._priceType,
+                    productDict.get("lastUpdate"),
+                )
+            )
+        return changes
+
+    # Call when the changes have been handed off, the next changes are compared
+    # with the current prices
+    def markPricesEmitted(self):
+        for productKey, productDict in self._products.items():
+            if "price" in productDict:
+                self._emittedPrices[productKey] = productDict["price"]
+
+    def getEmittedPrices(self):
+        return dict(self._emittedPrices)
+
+    # Restore the emitted prices, fx. from the previous run
+    def setEmittedPrices(self, prices):
+        self._emittedPrices = dict(prices)
+
+    # Close the session used by the parser
+    def close(self):
+        _LOGGER.debug("Closing session for: " + self._name)
+        self._parser.close()
+
     def getProductsKeys(self):
         return self._products.keys()
 
     def getProductName(self, productKey):
         return self._products[productKey]["name"]
 
+    def hasProductPrice(self, productKey):
+        return "price" in self._products[productKey]
+
     def getProductPrice(self, productKey):
         _LOGGER.debug("productDict: %s", self._products[productKey])
         return self._products[productKey]["price"]
@@ -219,3 +297,76 @@ class fuelCompany:
 
     def getPriceType(self):
         return self._priceType
+
+
+# Create a priceChange from the dict returned by priceChange.asDict
+def priceChangeFromDict(data):
+    return priceChange(
+        data["company_key"],
+        data["company_name"],
+        data["product_key"],
+        data["product_name"],
+        data["old_price"],
+        data["new_price"],
+        data["price_type"],
+        data["last_update"],
+    )
+
+
+class priceChange:
+    def __init__(
+        self,
+        companyKey,
+        companyName,
+        productKey,
+        productName,
+        oldPrice,
+        newPrice,
+        priceType,
+        lastUpdate,
+    ):
+        self.companyKey = companyKey  # Key of the company in the dict
+        self.companyName = companyName  # Name of the company
+        self.productKey = productKey  # Key of the product, fx. "diesel"
+        self.productName = productName  # Name of the product at the company
+        self.oldPrice = oldPrice  # Previous emitted price
+        self.newPrice = newPrice  # The new price
+        self.priceType = priceType  # "pump" or "list"
+        self.lastUpdate = lastUpdate  # Timestamp of the new price
+
+    # Key used when coalescing several changes of the same product
+    def getKey(self):
+        return self.companyKey + " " + self.productKey
+
+    # Merge a later change of the same product into this one
+    # Keep the oldest oldPrice and the newest of everything else
+    def merge(self, other):
+        return priceChange(
+            other.companyKey,
+            other.companyName,
+            other.productKey,
+            other.productName,
+            self.oldPrice,
+            other.newPrice,
+            other.priceType,
+            other.lastUpdate,
+        )
+
+    def asDict(self):
+        return {
+            "company_key": self.companyKey,
+            "company_name": self.companyName,
+            "product_key": self.productKey,
+            "product_name": self.productName,
+            "old_price": self.oldPrice,
+            "new_price": self.newPrice,
+            "price_type": self.priceType,
+            "last_update": self.lastUpdate,
+        }
+
+    def __repr__(self):
+        return "priceChange(%s: %s -> %s)" % (
+            self.getKey(),
+            self.oldPrice,
+            self.newPrice,
+        )
@@ -22,6 +22,10 @@ class fuelParser:
         # Initialize a new session for the scrapings
         self._session = requests.Session()
 
+    # Close the session and release the pooled connections
+    def close(self):
+        self._session.close()
+
     # GO'ON
     def goon(self, url, products):
         # Test if SSOCR, Seven Segments OCR, is present
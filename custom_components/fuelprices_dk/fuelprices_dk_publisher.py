@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+
+import aiohttp
+
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from .const import (
+    SINK_FILE,
+    SINK_MQTT,
+    SINK_TIMEOUT,
+    SINK_WEBHOOK,
+    STREAM_QUEUE_SIZE,
+)
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+_LOGGER = logging.getLogger(__name__)
+
+
+# Create the sink matching the type from the config, None if no sink is wanted
+def createSink(hass, sinkType, target):
+    if sinkType == SINK_MQTT:
+        return mqttSink(hass, target)
+    if sinkType == SINK_WEBHOOK:
+        return webhookSink(hass, target)
+    if sinkType == SINK_FILE:
+        return fileSink(hass, target)
+    return None
+
+
+# The payload delivered to all the sinks
+def _batchPayload(batch):
+    return {"changes": [change.asDict() for change in batch]}
+
+
+class priceEventStream:
+    """Fan out price changes to any number of async iterators.
+
+    Each subscriber has its own bounded queue. A subscriber that does not keep
+    up loses its oldest changes, it never blocks the refresh of the prices.
+    The queue is registered on the first iteration and removed again when the
+    iterator finishes, is closed or the stream is closed. Iterating a closed
+    stream ends at once.
+    """
+
+    def __init__(self, maxSize=STREAM_QUEUE_SIZE):
+        self._maxSize = maxSize
+        self._queues = set()
+        self._closed = False
+
+    async def subscribe(self):
+        if self._closed:
+            return
+        queue = asyncio.Queue(self._maxSize)
+        self._queues.add(queue)
+        try:
+            while True:
+                change = await queue.get()
+                # None is pushed when the stream is closed
+                if change is None:
+                    return
+                yield change
+        finally:
+            self._queues.discard(queue)
+
+    def push(self, changes):
+        for queue in self._queues:
+            for change in changes:
+                self._put(queue, change)
+
+    def close(self):
+        self._closed = True
+        for queue in list(self._queues):
+            self._put(queue, None)
+
+    def _put(self, queue, item):
+        # Drop the oldest item if the subscriber is lagging behind
+        if queue.full():
+            queue.get_nowait()
+            _LOGGER.debug("Price event subscriber is lagging, dropped oldest change")
+        queue.put_nowait(item)
+
+
+class pricePublisher:
+    """Deliver the price changes to a sink in batches.
+
+    The changes of a refresh are coalesced per company and product and
+    delivered as one batch. While the sink is busy, later refreshes are
+    coalesced into the pending batch, so a slow sink holds at most one change
+    per product and never blocks the coordinator. A failed batch is kept and
+    retried together with the changes of the next refresh. The pending changes
+    can be saved with getPending and restored with restorePending, to retry
+    them after a reload or a restart.
+    """
+
+    def __init__(self, sink):
+        self._sink = sink
+        self._pending = {}
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._failing = False
+
+    def publish(self, changes):
+        for change in changes:
+            self._coalesce(change, newer=True)
+        if self._pending:
+            self._wakeup.set()
+
+    # The changes not delivered yet
+    def getPending(self):
+        return list(self._pending.values())
+
+    # Restore changes not delivered before a reload or a restart
+    def restorePending(self, changes):
+        self._requeue(changes)
+        if self._pending:
+            self._wakeup.set()
+
+    def _coalesce(self, change, newer):
+        key = change.getKey()
+        if key not in self._pending:
+            self._pending[key] = change
+        elif newer:
+            self._pending[key] = self._pending[key].merge(change)
+        else:
+            self._pending[key] = change.merge(self._pending[key])
+        # A price that went back to where it started is no change at all
+        if self._pending[key].oldPrice == self._pending[key].newPrice:
+            del self._pending[key]
+
+    def start(self, hass, entry):
+        self._task = entry.async_create_background_task(
+            hass, self._run(), "fuelprices_dk publisher " + entry.entry_id
+        )
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await self._deliverPending()
+
+    async def _deliverPending(self):
+        batch = list(self._pending.values())
+        self._pending = {}
+        if not batch:
+            return
+        try:
+            await self._sink.deliver(batch)
+        except asyncio.CancelledError:
+            self._requeue(batch)
+            raise
+        except Exception as err:
+            # Log the first failure only, until a delivery succeeds again
+            if not self._failing:
+                _LOGGER.error("Unable to deliver price changes: %s", err)
+                self._failing = True
+            else:
+                _LOGGER.debug("Unable to deliver price changes: %s", err)
+            self._requeue(batch)
+            return
+        _LOGGER.debug("Delivered %s price changes", len(batch))
+        if self._failing:
+            _LOGGER.info("Delivery of price changes is working again")
+            self._failing = False
+
+    def _requeue(self, batch):
+        # The failed batch is older than anything published since
+        for change in batch:
+            self._coalesce(change, newer=False)
+
+    async def async_stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Make a last attempt to deliver what is pending, unless the sink is down.
+        # What is left is saved by the caller and retried on the next start
+        if self._failing:
+            return
+        try:
+            await asyncio.wait_for(self._deliverPending(), SINK_TIMEOUT)
+        except asyncio.TimeoutError:
+            _LOGGER.warning("Timeout delivering the last price changes")
+
+
+class mqttSink:
+    def __init__(self, hass, topic):
+        self._hass = hass
+        self._topic = topic
+
+    async def deliver(self, batch):
+        # Use the MQTT integration of Home Assistant, only imported when used
+        from homeassistant.components import mqtt
+
+        await mqtt.async_publish(
+            self._hass, self._topic, json.dumps(_batchPayload(batch))
+        )
+
+
+class webhookSink:
+    def __init__(self, hass, url):
+        self._session = async_get_clientsession(hass)
+        self._url = url
+
+    async def deliver(self, batch):
+        async with self._session.post(
+            self._url,
+            json=_batchPayload(batch),
+            timeout=aiohttp.ClientTimeout(total=SINK_TIMEOUT),
+        ) as r:
+            _LOGGER.debug("URL: " + self._url + " [" + str(r.status) + "]")
+            r.raise_for_status()
+
+
+class fileSink:
+    def __init__(self, hass, path):
+        self._hass = hass
+        self._path = path
+
+    async def deliver(self, batch):
+        await self._hass.async_add_executor_job(
+            self._append, json.dumps(_batchPayload(batch))
+        )
+
+    # Append the batch as a single JSON line
+    def _append(self, line):
+        # Only write where allowlist_external_dirs allows it
+        if not self._hass.config.is_allowed_path(self._path):
+            raise PermissionError("Path is not allowed: " + self._path)
+        with open(self._path, "a", encoding="utf-8") as file:
+            file.write(line + "\n")
@@ -1,72 +1,57 @@
 from __future__ import annotations
 
-import asyncio
 import logging
 
+from homeassistant.config_entries import SOURCE_IMPORT
 from homeassistant.const import ATTR_ATTRIBUTION
 from .const import (
     CONF_CLIENT,
-    CONF_UPDATE_INTERVAL,
-    CONF_PLATFORM,
+    CONF_COORDINATOR,
     CREDITS,
     DOMAIN,
 )
 
-from datetime import timedelta
-
 from homeassistant.components.sensor import (
     SensorEntity,
     SensorStateClass,
     SensorDeviceClass,
 )
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 _LOGGER = logging.getLogger(__name__)
 
 
-async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
-
-    updateInterval = hass.data[DOMAIN][CONF_UPDATE_INTERVAL]
-
-    # Define a update function
-    async def async_update_data():
-        # Retrieve the client stored in the hass data stack
-        fuelPrices = hass.data[DOMAIN][CONF_CLIENT]
-        # Loop through the fuelcompanies and call the refresh function
-        # Sleep for 3 seconds
-        for company in fuelPrices.getCompanies():
-            await hass.async_add_executor_job(company.refreshPrices)
-            await asyncio.sleep(3)
-
-    # Create a coordinator
-    coordinator = DataUpdateCoordinator(
-        hass,
-        _LOGGER,
-        name=CONF_PLATFORM,
-        update_method=async_update_data,
-        update_interval=timedelta(minutes=updateInterval),
-    )
+async def async_setup_entry(hass, entry, async_add_entities):
+    # Retrieve the client and the coordinator stored for this entry
+    fuelPrices = hass.data[DOMAIN][entry.entry_id][CONF_CLIENT]
+    coordinator = hass.data[DOMAIN][entry.entry_id][CONF_COORDINATOR]
 
-    # Immediate refresh
-    await coordinator.async_request_refresh()
+    # The imported YAML entry keeps the unique IDs used before config entries,
+    # entries created from the UI are prefixed to avoid collisions between them
+    uniquePrefix = "" if entry.source == SOURCE_IMPORT else entry.entry_id + " "
 
     # Add the sensors to Home Assistant
     entities = []
-    fuelPrices = hass.data[DOMAIN][CONF_CLIENT]
     for companyKey in fuelPrices.getCompanyKeys():
         for productKey in fuelPrices.getCompanyProductsKeys(companyKey):
             # Create a instance of the FuelPriceSensor and append it to the list
-            entities.append(FuelPriceSensor(hass, coordinator, companyKey, productKey))
+            entities.append(
+                FuelPriceSensor(
+                    coordinator,
+                    fuelPrices.getCompany(companyKey),
+                    productKey,
+                    uniquePrefix,
+                )
+            )
     # Add all the sensors to Home Assistant
     async_add_entities(entities)
 
 
 class FuelPriceSensor(SensorEntity):
-    def __init__(self, hass, coordinator, companyKey, productKey) -> None:
-        self._hass = hass
+    def __init__(self, coordinator, fuelCompany, productKey, uniquePrefix) -> None:
         self._coordinator = coordinator
-        self._fuelCompany = hass.data[DOMAIN][CONF_CLIENT].getCompany(companyKey)
+        self._fuelCompany = fuelCompany
+        self._uniquePrefix = uniquePrefix
         self._companyName = self._fuelCompany.getName()
         self._productName = self._fuelCompany.getProductName(productKey)
         self._productKey = productKey
@@ -104,7 +89,7 @@ class FuelPriceSensor(SensorEntity):
 
     @property
     def unique_id(self):
-        return self._companyName + " " + self._productKey
+        return self._uniquePrefix + self._companyName + " " + self._productKey
 
     @property
     def device_class(self):
@@ -123,7 +108,9 @@ class FuelPriceSensor(SensorEntity):
     @property
     def available(self):
         """Return if entity is available."""
-        return self._coordinator.last_update_success
+        # A company failing on the first refresh has no prices yet
+        hasPrice = self._fuelCompany.hasProductPrice(self._productKey)
+        return self._coordinator.last_update_success and hasPrice
 
     async def async_update(self):
         """Update the entity. Only used by the generic entity update service."""